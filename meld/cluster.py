@@ -1,10 +1,11 @@
 # Copyright (C) 2020 Krishnaswamy Lab, Yale University
 
+import warnings
 import numpy as np
 import pandas as pd
 from scipy import sparse
 from sklearn.base import BaseEstimator
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn import preprocessing, decomposition
 import scprep
 from . import utils
@@ -32,8 +33,19 @@ class VertexFrequencyCluster(BaseEstimator):
         Suppress warnings
     random_state : int or None, optional (default: None)
         Random seed for clustering
+    use_minibatch : bool, optional, default: False
+        Use MiniBatchKMeans for clustering. This is significantly faster
+        on large datasets, at the cost of slightly worse clusters
+    n_eigenvectors : int or None, optional, default: None
+        Number of low-frequency Fourier basis vectors to compute the
+        spectrogram on. If None, the full Fourier basis is used.
+        Computing a partial basis is significantly faster on large graphs
+    device : str, optional, default: 'cpu'
+        Device to compute spectrograms on. Any other value than 'cpu'
+        (e.g. 'cuda') computes dense spectrograms with PyTorch on that device,
+        falling back to the CPU if PyTorch or the device is not available
     **kwargs
-        Description
+        Additional arguments for KMeans
 
     Raises
     ------
@@ -54,9 +66,17 @@ class VertexFrequencyCluster(BaseEstimator):
         sparse=False,
         suppress=False,
         random_state=None,
+        use_minibatch=False,
+        n_eigenvectors=None,
+        device="cpu",
         **kwargs
     ):
         self.suppress = suppress
+        self.random_state = random_state
+        self.use_minibatch = use_minibatch
+        self.n_eigenvectors = n_eigenvectors
+        self.device = device
+        self._device = None
         self.sparse = sparse
         self._basewindow = None
         if window_sizes is None:
@@ -70,21 +90,21 @@ class VertexFrequencyCluster(BaseEstimator):
         self.window = None
         self.eigenvectors = None
         self.N = None
-        self.spec_hist = None
         self.spectrogram = None
         self.combined_spectrogram = None
+        self._pca_data = None
         self.isfit = False
         self.likelihood = None
         self.sample_indicator = None
         self._sklearn_params = kwargs
 
     def _activate(self, x, alpha=1):
-        """Activate spectrograms for clustering
+        """Activate spectrograms for clustering in place
 
         Parameters
         ----------
-        x : numeric
-            input signal
+        x : np.ndarray
+            input signal, overwritten by the activated signal
         alpha : int, optional
             amount of activation
 
@@ -92,7 +112,10 @@ class VertexFrequencyCluster(BaseEstimator):
         -------
         activated signal
         """
-        return np.tanh(alpha * np.abs(x))
+        np.abs(x, out=x)
+        if alpha != 1:
+            x *= alpha
+        return np.tanh(x, out=x)
 
     def _compute_spectrogram(self, sample_indicator, window):
         """Computes spectrograms for arbitrary window/signal/graph combinations
@@ -119,7 +142,7 @@ class VertexFrequencyCluster(BaseEstimator):
         # tic = time.time()
         # print('    Computing spectrogram for window')
         if len(sample_indicator.shape) == 1:
-            sample_indicator = np.array(sample_indicator)
+            sample_indicator = np.asarray(sample_indicator, dtype=np.float32)
         else:
             raise ValueError(
                 "sample_indicator must be 1-dimensional. Got shape: {}".format(
@@ -127,21 +150,45 @@ class VertexFrequencyCluster(BaseEstimator):
                 )
             )
         if sparse.issparse(window):
+            # scale the columns through the CSR data array rather than
+            # broadcasting with `multiply`, which builds a diagonal matrix
+            C = sparse.csr_matrix(window, copy=True)
+            C.data *= sample_indicator[C.indices]
             # the next computation becomes dense - better to make dense now
-            C = window.multiply(sample_indicator).toarray()
+            C = C.toarray()
         else:
             C = np.multiply(window, sample_indicator)
-        C = preprocessing.normalize(self.eigenvectors.T @ C, axis=0)
+        C = utils._normalize_columns(self.eigenvectors.T @ C)
         # print('     finished in {:.2f} seconds'.format(time.time() - tic))
         return C.T
 
     def _compute_multiresolution_spectrogram(self, sample_indicator):
-        """Compute multiresolution spectrogram by repeatedly calling
-        _compute_spectrogram"""
+        """Compute multiresolution spectrogram by summing the activated
+        spectrogram of each window"""
 
         # tic = time.time()
         # print('  Computing multiresolution spectrogram')
-        spectrogram = np.zeros((self.windows[0].shape[1], self.eigenvectors.shape[1]))
+        if self._device is not None:
+            return self._compute_device_spectrogram(sample_indicator)
+
+        if isinstance(self.windows, np.ndarray):
+            # dense windows are stacked: accumulate one window at a time into
+            # preallocated buffers rather than holding a spectrogram per window
+            sample_indicator = np.asarray(sample_indicator, dtype=np.float32)
+            spectrogram = np.zeros(
+                (self.eigenvectors.shape[1], self.windows.shape[2]), dtype=np.float32
+            )
+            masked = np.empty(self.windows.shape[1:], dtype=np.float32)
+            C = np.empty_like(spectrogram)
+            for window in self.windows:
+                np.multiply(window, sample_indicator, out=masked)
+                np.matmul(self.eigenvectors.T, masked, out=C)
+                spectrogram += self._activate(utils._normalize_columns(C))
+            return spectrogram.T
+
+        spectrogram = np.zeros(
+            (self.windows[0].shape[1], self.eigenvectors.shape[1]), dtype=np.float32
+        )
 
         for window in self.windows:
             curr_spectrogram = self._compute_spectrogram(
@@ -154,6 +201,58 @@ class VertexFrequencyCluster(BaseEstimator):
 
         return spectrogram
 
+    def _compute_device_spectrogram(self, sample_indicator):
+        """Compute multiresolution spectrogram with PyTorch on `self.device`"""
+        import torch
+
+        sample_indicator = torch.as_tensor(
+            np.asarray(sample_indicator, dtype=np.float32), device=self._device
+        )
+        eigenvectors_T = self._device_eigenvectors.T
+        spectrogram = torch.zeros(
+            (eigenvectors_T.shape[0], self.N), dtype=torch.float32, device=self._device
+        )
+        for window in self._device_windows:
+            C = eigenvectors_T @ (window * sample_indicator)
+            norms = torch.linalg.vector_norm(C, dim=0)
+            norms[norms == 0] = 1
+            C /= norms
+            spectrogram += C.abs_().tanh_()
+        return spectrogram.T.cpu().numpy()
+
+    def _check_device(self):
+        """Returns the torch device to compute spectrograms on, or None to use
+        numpy"""
+        if self.device == "cpu":
+            return None
+        if self.sparse:
+            if not self.suppress:
+                warnings.warn(
+                    "device={} is not supported with sparse=True. Computing "
+                    "spectrograms on the CPU.".format(self.device),
+                    RuntimeWarning,
+                )
+            return None
+        try:
+            import torch
+        except ImportError:
+            if not self.suppress:
+                warnings.warn(
+                    "PyTorch is required for device={}. Computing spectrograms on "
+                    "the CPU.".format(self.device),
+                    RuntimeWarning,
+                )
+            return None
+        device = torch.device(self.device)
+        if device.type == "cuda" and not torch.cuda.is_available():
+            if not self.suppress:
+                warnings.warn(
+                    "CUDA is not available. Computing spectrograms on the CPU.",
+                    RuntimeWarning,
+                )
+            return None
+        return device
+
     def _compute_window(self, window, t=1):
         """_compute_window
         These windows mask the signal (sample_indicator) to perform a Windowed Graph
@@ -162,18 +261,48 @@ class VertexFrequencyCluster(BaseEstimator):
 
         This function is used when the power of windows is NOT diadic
         """
-        if sparse.issparse(window):
-            window = window ** t
-        else:
-            window = np.linalg.matrix_power(window, t)
-        return preprocessing.normalize(window, "l2", axis=0).T
+        power = self._power_matrix(window, t)
+        if sparse.issparse(window) and not sparse.issparse(power):
+            power = sparse.csr_matrix(power)
+        return preprocessing.normalize(power, "l2", axis=0).T
 
     def _power_matrix(self, a, n):
-        if sparse.issparse(a):
-            a = a ** n
-        else:
-            a = np.linalg.matrix_power(a, n)
-        return a
+        """Raises `a` to the integer power `n`. Sparse powers are returned dense
+        once their fill-in makes dense products faster"""
+        if not sparse.issparse(a):
+            return np.linalg.matrix_power(a, n)
+        return self._compose_power(self._power_ladder(a, n), n)
+
+    def _matmul(self, a, b, fill=0.1):
+        """Multiplies two matrices, making sparse operands dense once their
+        fill-in makes a sparse product slower than a dense one"""
+        if sparse.issparse(a) and a.nnz > fill * np.prod(a.shape):
+            a = a.toarray()
+        if sparse.issparse(b) and b.nnz > fill * np.prod(b.shape):
+            b = b.toarray()
+        return a @ b
+
+    def _power_ladder(self, a, n):
+        """Computes the repeated squarings a, a^2, a^4, ... needed for a^n"""
+        ladder = [a]
+        for _ in range(int(n).bit_length() - 1):
+            ladder.append(self._matmul(ladder[-1], ladder[-1]))
+        return ladder
+
+    def _compose_power(self, ladder, n):
+        """Computes a^n from the repeated squarings of a in `ladder`"""
+        power = None
+        for k, a in enumerate(ladder):
+            if int(n) >> k & 1:
+                power = a if power is None else self._matmul(power, a)
+        if power is None:
+            # a^0 is the identity
+            a = ladder[0]
+            if sparse.issparse(a):
+                power = sparse.identity(a.shape[0], format="csr")
+            else:
+                power = np.eye(a.shape[0])
+        return power
 
     def _compute_windows(self):
         """_compute_window
@@ -181,26 +310,91 @@ class VertexFrequencyCluster(BaseEstimator):
         Fourier Transform (WGFT) as described by Shuman et al.
         (https://arxiv.org/abs/1307.5708).
 
-        This function is used when the power of windows is diadic and
-        computes all windows efficiently.
+        This function is used when each power of windows is twice the previous
+        one and computes all windows efficiently. Windows are yielded one at a
+        time.
         """
-        windows = []
-        curr_window = self._basewindow
-        windows.append(preprocessing.normalize(curr_window, "l2", axis=0).T)
+        curr_window = self._power_matrix(self._basewindow, self.window_sizes[0])
+        yield self._format_window(preprocessing.normalize(curr_window, "l2", axis=0).T)
         for i in range(len(self.window_sizes) - 1):
-            curr_window = self._power_matrix(curr_window, 2)
-            windows.append(preprocessing.normalize(curr_window, "l2", axis=0).T)
-        return windows
+            # the first squaring of a sparse base window is a cheap sparse product
+            curr_window = self._format_window(self._power_matrix(curr_window, 2))
+            yield preprocessing.normalize(curr_window, "l2", axis=0).T
+
+    def _compute_ladder_windows(self):
+        """_compute_ladder_windows
+        These windows mask the signal (sample_indicator) to perform a Windowed Graph
+        Fourier Transform (WGFT) as described by Shuman et al.
+        (https://arxiv.org/abs/1307.5708).
+
+        This function is used when the power of windows is NOT diadic and the
+        windows cannot be computed spectrally. The repeated squarings of the base
+        window are computed once and shared by all windows. Windows are yielded
+        one at a time.
+        """
+        ladder = self._power_ladder(self._basewindow, np.max(self.window_sizes))
+        for t in self.window_sizes:
+            window = self._format_window(self._compose_power(ladder, t))
+            yield preprocessing.normalize(window, "l2", axis=0).T
+
+    def _format_window(self, window):
+        """Converts windows to dense, or to sparse if `sparse=True`"""
+        if self.sparse and not sparse.issparse(window):
+            window = sparse.csr_matrix(window)
+        elif not self.sparse and sparse.issparse(window):
+            window = window.toarray()
+        return window
+
+    def _compute_spectral_windows(self, G):
+        """_compute_spectral_windows
+        These windows mask the signal (sample_indicator) to perform a Windowed Graph
+        Fourier Transform (WGFT) as described by Shuman et al.
+        (https://arxiv.org/abs/1307.5708).
+
+        This function is used when the power of windows is NOT diadic. The
+        diffusion operator P = D^-1 K is similar to the symmetric diffusion
+        affinity A = D^-1/2 K D^-1/2 = V diag(e) V^T, so every power is built
+        from a single eigendecomposition as P^t = D^-1/2 V diag(e^t) V^T D^1/2.
+        Windows are yielded one at a time.
+        """
+        diff_aff = G.diff_aff
+        if sparse.issparse(diff_aff):
+            diff_aff = diff_aff.toarray()
+        e, V = np.linalg.eigh(diff_aff)
+        degrees = np.sqrt(np.asarray(G.kernel_degree).flatten())
+        left = V / degrees[:, None]
+        right = V * degrees[:, None]
+        for t in self.window_sizes:
+            window = (left * np.power(e, t)) @ right.T
+            yield utils._normalize_columns(window).T
+
+    def _is_symmetric(self, G):
+        """Checks whether the kernel of `G` is symmetric, in which case its
+        diffusion affinity can be diagonalised with `eigh`"""
+        K = G.kernel
+        if sparse.issparse(K):
+            asymmetry = abs(K - K.T).max()
+        else:
+            asymmetry = np.abs(K - K.T).max()
+        return asymmetry <= 1e-10 * abs(K).max()
 
     def _combine_spectrogram_likelihood(self, spectrogram, likelihood):
         """Normalizes and concatenates the likelihood to the
         spectrogram for clustering"""
 
-        spectrogram_n = spectrogram / np.linalg.norm(spectrogram)
+        likelihood = likelihood.reshape(likelihood.shape[0], -1)
+        n_freq = spectrogram.shape[1]
+        data_nu = np.empty(
+            (spectrogram.shape[0], n_freq + likelihood.shape[1]),
+            dtype=spectrogram.dtype,
+        )
+
+        spectrogram_n = data_nu[:, :n_freq]
+        np.divide(spectrogram, np.linalg.norm(spectrogram), out=spectrogram_n)
 
-        ees_n = likelihood / np.linalg.norm(likelihood, ord=2, axis=0)
-        ees_n = ees_n * self.likelihood_bias
-        data_nu = np.c_[spectrogram_n, ees_n]
+        ees_n = data_nu[:, n_freq:]
+        np.divide(likelihood, np.linalg.norm(likelihood, ord=2, axis=0), out=ees_n)
+        ees_n *= self.likelihood_bias
         return data_nu
 
     def fit(self, G):
@@ -208,32 +402,58 @@ class VertexFrequencyCluster(BaseEstimator):
 
         self.graph = utils._check_pygsp_graph(G)
 
+        # windows are powers of the graph diffusion operator unless set otherwise
         if self._basewindow is None:
             self._basewindow = G.diff_op
-        if not self.sparse and sparse.issparse(self._basewindow):
-            self._basewindow = self._basewindow.toarray()
-        elif self.sparse and not sparse.issparse(self._basewindow):
+        use_diff_op = self._basewindow is G.diff_op
+        # the base window is only densified when a dense product needs it
+        if self.sparse and not sparse.issparse(self._basewindow):
             self._basewindow = sparse.csr_matrix(self._basewindow)
 
-        self.windows = []
         # tic = time.time()
         # print('Building windows')
-        # Check if windows were generated using powers of 2
-        if np.all(np.diff(np.log2(self.window_sizes)) == 1):
-            self.windows = self._compute_windows()
+        # Check if each window is the square of the previous one
+        window_sizes = np.asarray(self.window_sizes)
+        if np.all(window_sizes[1:] == 2 * window_sizes[:-1]):
+            windows = self._compute_windows()
+        elif use_diff_op and not self.sparse and self._is_symmetric(G):
+            windows = self._compute_spectral_windows(G)
         else:
-            for t in self.window_sizes:
-                self.windows.append(
-                    self._compute_window(self._basewindow, t=t).astype(float)
-                )
+            windows = self._compute_ladder_windows()
+        # spectrograms are only used for clustering: single precision suffices
+        if self.sparse:
+            self.windows = [window.astype(np.float32) for window in windows]
+        else:
+            # write each window into one contiguous buffer as it is computed
+            self.windows = np.empty(
+                (len(window_sizes), self.graph.N, self.graph.N), dtype=np.float32
+            )
+            for i, window in enumerate(windows):
+                self.windows[i] = window
         # print(' finished in {:.2f} seconds'.format(time.time() - tic))
 
         # tic = time.time()
         # print('Computing Fourier basis')
         # Compute Fourier basis. This may take some time.
-        self.graph.compute_fourier_basis()
-        self.eigenvectors = self.graph.U
+        # PyGSP keeps the basis on the graph until its Laplacian changes
+        if self.n_eigenvectors is None or self.n_eigenvectors >= self.graph.N:
+            self.graph.compute_fourier_basis()
+        else:
+            self.graph.compute_fourier_basis(n_eigenvectors=self.n_eigenvectors)
+        # a previously computed basis may hold more eigenvectors than requested
+        self.eigenvectors = self.graph.U[:, : self.n_eigenvectors].astype(np.float32)
         self.N = self.graph.N
+
+        self._device = self._check_device()
+        self._device_windows = None
+        self._device_eigenvectors = None
+        if self._device is not None:
+            import torch
+
+            self._device_windows = torch.as_tensor(self.windows, device=self._device)
+            self._device_eigenvectors = torch.as_tensor(
+                self.eigenvectors, device=self._device
+            )
         self.isfit = True
         # print(' finished in {:.2f} seconds'.format(time.time() - tic))
 
@@ -257,7 +477,9 @@ class VertexFrequencyCluster(BaseEstimator):
             raise TypeError("`likelihood` must be array-like.")
 
         # Checking shape of sample_indicator
-        self.sample_indicator = np.array(self.sample_indicator)
+        # this is a copy in the dtype of the spectrogram, so it can be centered
+        # in place without modifying the input
+        self.sample_indicator = np.array(self.sample_indicator, dtype=np.float32)
         if self.N not in self.sample_indicator.shape:
             raise ValueError(
                 "At least one axis of `sample_indicator` must be" " of length `N`."
@@ -276,11 +498,14 @@ class VertexFrequencyCluster(BaseEstimator):
                         str(sample_indicator.shape), str(likelihood.shape)
                     )
                 )
-            self.likelihood = np.array(self.likelihood)
+            self.likelihood = np.asarray(self.likelihood, dtype=np.float32)
+
+        # a new spectrogram invalidates the PCA computed by `predict`
+        self._pca_data = None
 
         # Subtract the mean from the sample_indicator
         if center:
-            self.sample_indicator = self.sample_indicator - self.sample_indicator.mean()
+            self.sample_indicator -= self.sample_indicator.mean()
 
         # If only one sample_indicator, no need to collect
         if len(self.sample_indicator.shape) == 1:
@@ -316,9 +541,6 @@ class VertexFrequencyCluster(BaseEstimator):
 
         if n_clusters is not None:
             self.n_clusters = n_clusters
-        self._clusterobj = KMeans(
-            n_clusters=self.n_clusters, **kwargs, **self._sklearn_params
-        )
 
         if not self.isfit:
             raise ValueError(
@@ -336,11 +558,30 @@ class VertexFrequencyCluster(BaseEstimator):
             data = self.combined_spectrogram
         # tic = time.time()
         # print('Running PCA on the spectrogram')
-        data = decomposition.PCA(self.n_clusters).fit_transform(data)
+        # the PCA only depends on the spectrogram and is reused across calls
+        if self._pca_data is None or self._pca_data.shape[1] != self.n_clusters:
+            self._pca_data = decomposition.PCA(
+                self.n_clusters,
+                svd_solver="randomized",
+                random_state=self.random_state,
+            ).fit_transform(data)
+        data = self._pca_data
         # print(' finished in {:.2f} seconds'.format(time.time()-tic))
 
         # tic = time.time()
         # print('Running clustering')
+        params = {"random_state": self.random_state}
+        if self.use_minibatch:
+            params["batch_size"] = max(1024, data.shape[0] // 20)
+            params.update(self._sklearn_params, **kwargs)
+            self._clusterobj = MiniBatchKMeans(n_clusters=self.n_clusters, **params)
+        else:
+            # Elkan's algorithm skips distance computations via the
+            # triangle inequality and is exact
+            params["algorithm"] = "elkan"
+            params.update(self._sklearn_params, **kwargs)
+            self._clusterobj = KMeans(n_clusters=self.n_clusters, **params)
+
         self.labels_ = self._clusterobj.fit_predict(data)
 
         if self.likelihood is not None:
@@ -1,5 +1,9 @@
 import pygsp
 import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from . import utils
 
 
 def filter(
@@ -31,27 +35,46 @@ def filter(
     solver : string, optional, Default: 'chebyshev'
         Method to solve convex problem.
         'chebyshev' uses a chebyshev polynomial approximation of the corresponding
-        filter. 'exact' uses the eigenvalue solution to the problem
+        filter. 'exact' uses the eigenvalue solution to the problem. 'matrix'
+        solves the linear system of the laplacian filter with a sparse LU
+        factorization and requires offset=0 and an integer order
     chebyshev_order : int, optional, Default: 50
         Order of chebyshev approximation to use.
     """
 
-    graph.estimate_lmax()
+    if solver == "exact":
+        # the exact filter is evaluated at the largest eigenvalue of the basis
+        graph.compute_fourier_basis()
+        lmax = graph.e[-1]
+    else:
+        lmax = _estimate_lmax(graph)
 
     # Generate MELD filter
     if filter.lower() == "laplacian":
 
         def filterfunc(x):
-            return 1 / (1 + (beta * np.abs(x / graph.lmax - offset)) ** order)
+            return 1 / (1 + (beta * np.abs(x / lmax - offset)) ** order)
 
     elif filter.lower() == "heat":
 
         def filterfunc(x):
-            return np.exp(-beta * np.abs(x / graph.lmax - offset) ** order)
+            return np.exp(-beta * np.abs(x / lmax - offset) ** order)
 
     else:
         raise NotImplementedError
 
+    if solver == "chebyshev":
+        return _chebyshev_filter(signal, graph, lmax, filterfunc, chebyshev_order)
+    elif solver == "matrix":
+        if filter.lower() != "laplacian" or offset != 0 or int(order) != order:
+            raise ValueError(
+                "The 'matrix' solver requires filter='laplacian', offset=0 "
+                "and an integer order. Got filter={}, offset={}, order={}".format(
+                    filter, offset, order
+                )
+            )
+        return _matrix_filter(signal, graph, lmax, beta, int(order))
+
     # build filter
     filt = pygsp.filters.Filter(graph, filterfunc)
 
@@ -59,3 +82,70 @@ def filter(
     densities = filt.filter(signal, method=solver, order=chebyshev_order)
 
     return densities
+
+
+def _estimate_lmax(graph):
+    """Estimates the largest eigenvalue of the graph Laplacian (cached per graph)
+
+    PyGSP re-runs its Lanczos estimate whenever the Fourier basis has replaced
+    it in between, so the estimate is kept with the graph instead. It is
+    recomputed when `compute_laplacian` replaces the Laplacian.
+    """
+    cache = utils._get_graph_cache(graph)
+    if "lmax" not in cache or cache["lmax"][0] is not graph.L:
+        graph.estimate_lmax()
+        cache["lmax"] = (graph.L, graph.lmax)
+    return cache["lmax"][1]
+
+
+def _chebyshev_filter(signal, graph, lmax, filterfunc, order):
+    """Applies a Chebyshev polynomial approximation of `filterfunc` to `signal`
+
+    Equivalent to `pygsp.filters.Filter.filter(method='chebyshev')`, using the
+    three-term recurrence T_k = 2 L' T_{k-1} - T_{k-2} with L' = L / a - I,
+    a = lmax / 2, applied to all signals at once.
+    """
+    signal = np.asarray(signal, dtype=float)
+    a = lmax / 2
+    n = order + 1
+
+    # Chebyshev coefficients by quadrature at the Chebyshev nodes on [0, lmax]
+    theta = np.pi * (np.arange(n) + 0.5) / n
+    coeffs = (
+        2
+        / n
+        * np.cos(np.outer(np.arange(n), theta))
+        @ filterfunc(a * np.cos(theta) + a)
+    )
+
+    # fold the scaling and shift into the CSR operator once, so that each
+    # step of the recurrence is a single sparse product and one subtraction
+    L2 = sparse.csr_matrix(graph.L) * (2 / a) - 2 * sparse.identity(
+        graph.N, format="csr"
+    )
+
+    T_prev = signal
+    T_curr = L2 @ signal
+    T_curr *= 0.5
+    densities = 0.5 * coeffs[0] * T_prev + coeffs[1] * T_curr
+    for c in coeffs[2:]:
+        T_next = L2 @ T_curr
+        T_next -= T_prev
+        densities += c * T_next
+        T_prev, T_curr = T_curr, T_next
+
+    return densities
+
+
+def _matrix_filter(signal, graph, lmax, beta, order):
+    """Applies the laplacian filter 1 / (1 + (beta * x / lmax) ** order) exactly
+
+    Solves (I + (beta * L / lmax) ** order) x = signal with a single sparse LU
+    factorization instead of an eigendecomposition or an explicit inverse.
+    """
+    L = sparse.csc_matrix(graph.L) * (beta / lmax)
+    L_power = L
+    for _ in range(order - 1):
+        L_power = L_power @ L
+    lu = splu(sparse.csc_matrix(sparse.identity(graph.N) + L_power))
+    return lu.solve(np.asarray(signal, dtype=float))
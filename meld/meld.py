@@ -29,7 +29,9 @@ class MELD(GraphEstimator):
     solver : string, optional, Default: 'chebyshev'
         Method to solve convex problem.
         'chebyshev' uses a chebyshev polynomial approximation of the corresponding
-        filter. 'exact' uses the eigenvalue solution to the problem
+        filter. 'exact' uses the eigenvalue solution to the problem. 'matrix'
+        solves the linear system of the laplacian filter with a sparse LU
+        factorization and requires offset=0 and an integer order
     chebyshev_order : int, optional, Default: 50
         Order of chebyshev approximation to use.
     lap_type : ('combinatorial', 'normalized'), Default: 'combinatorial'
@@ -70,8 +72,10 @@ class MELD(GraphEstimator):
         default="chebyshev",
         doc="Method to solve convex problem."
         "'chebyshev' uses a chebyshev polynomial approximation of the corresponding"
-        "filter. 'exact' uses the eigenvalue solution to the problem",
-        on_set=partial(graphtools.utils.check_in, ["chebyshev", "exact"]),
+        "filter. 'exact' uses the eigenvalue solution to the problem. 'matrix' "
+        "solves the linear system of the laplacian filter with a sparse LU "
+        "factorization and requires offset=0 and an integer order",
+        on_set=partial(graphtools.utils.check_in, ["chebyshev", "exact", "matrix"]),
     )
     chebyshev_order = attribute(
         "chebyshev_order",
@@ -1,5 +1,7 @@
 # Copyright (C) 2020 Krishnaswamy Lab, Yale University
 
+import weakref
+import numpy as np
 import pandas as pd
 import graphtools.base
 import graphtools
@@ -7,11 +9,23 @@ import pygsp
 import scprep
 import sklearn
 
+# results computed from a graph, kept for as long as the graph is alive
+_graph_cache = weakref.WeakKeyDictionary()
+
+
+def _get_graph_cache(G):
+    """Returns a dictionary of results cached for the lifetime of the graph `G`"""
+    return _graph_cache.setdefault(G, {})
+
 
 def _check_pygsp_graph(G):
     if isinstance(G, graphtools.base.BaseGraph):
         if not isinstance(G, pygsp.graphs.Graph):
-            G = G.to_pygsp()
+            # reuse the conversion so results cached on the PyGSP graph persist
+            cache = _get_graph_cache(G)
+            if "pygsp" not in cache:
+                cache["pygsp"] = G.to_pygsp()
+            G = cache["pygsp"]
     else:
         raise TypeError(
             "Input graph should be of type graphtools.base.BaseGraph."
@@ -20,6 +34,19 @@ def _check_pygsp_graph(G):
     return G
 
 
+def _normalize_columns(X):
+    """L2-normalizes the columns of a dense array (or stack of arrays) in place.
+
+    Columns with zero norm are left unchanged, as in
+    `sklearn.preprocessing.normalize`.
+    """
+    norms = np.einsum("...ij,...ij->...j", X, X)
+    np.sqrt(norms, out=norms)
+    norms[norms == 0] = 1
+    X /= norms[..., None, :]
+    return X
+
+
 def get_meld_cmap():
     """Returns cmap used in publication for displaying EES.
     Inspired by cmocean `balance` cmap"""
@@ -9,7 +9,7 @@ install_requires = [
     "graphtools>=1.5.0",
     "pandas>=0.25",
     "scprep>=1.0",
-    "pygsp",
+    "pygsp>=0.6",
     "scikit-learn",
 ]
 
@@ -6,10 +6,11 @@ import graphtools as gt
 import meld
 import pygsp
 import unittest
+import importlib.util
 
 from scipy import sparse
 from parameterized import parameterized
-from utils import make_batches, assert_raises_message
+from utils import make_batches, assert_raises_message, assert_warns_message
 
 from packaging import version
 
@@ -93,6 +94,52 @@ def test_meld(filter):
     assert meld_op.sample_densities is None
 
 
+@parameterized([("heat",), ("laplacian",)])
+def test_chebyshev_filter(filter):
+    data, labels = make_batches(n_pts_per_cluster=100)
+    meld_op = meld.MELD(verbose=0, filter=filter, offset=0.1, order=2)
+    meld_op.fit_transform(data, labels)
+    G = meld_op.graph
+    signal = meld_op.sample_indicators.values
+    densities = meld.filter.filter(
+        signal, G, filter, beta=60, offset=0.1, order=2, chebyshev_order=50
+    )
+
+    def filterfunc(x):
+        x = np.abs(x / G.lmax - 0.1)
+        if filter == "heat":
+            return np.exp(-60 * x**2)
+        return 1 / (1 + (60 * x) ** 2)
+
+    expected = pygsp.filters.Filter(G, filterfunc).filter(
+        signal, method="chebyshev", order=50
+    )
+    np.testing.assert_allclose(densities, expected, atol=1e-12)
+
+
+def test_matrix_filter():
+    data, labels = make_batches(n_pts_per_cluster=100)
+    meld_op = meld.MELD(verbose=0, filter="laplacian", order=2, solver="matrix")
+    densities = meld_op.fit_transform(data, labels)
+    G = meld_op.graph
+    lmax = G.lmax
+
+    def filterfunc(x):
+        return 1 / (1 + (meld_op.beta * x / lmax) ** 2)
+
+    expected = pygsp.filters.Filter(G, filterfunc).filter(
+        meld_op.sample_indicators.values, method="exact"
+    )
+    np.testing.assert_allclose(densities, expected, atol=1e-10)
+
+    with assert_raises_message(
+        ValueError,
+        "The 'matrix' solver requires filter='laplacian', offset=0 "
+        "and an integer order. Got filter=heat, offset=0, order=1",
+    ):
+        meld.MELD(verbose=0, filter="heat", solver="matrix").fit_transform(data, labels)
+
+
 def test_meld_invalid_lap_type():
     data = np.random.normal(0, 2, (1000, 2))
     # lap type TypeError
@@ -247,6 +294,45 @@ class TestCluster(unittest.TestCase):
         ):
             vfc_op._compute_spectrogram(self.data, window)
 
+    def _assert_windows(self, G, window_sizes, sparse_windows=False):
+        vfc_op = meld.VertexFrequencyCluster(
+            window_sizes=window_sizes, sparse=sparse_windows
+        )
+        vfc_op.fit(G)
+        for t, window in zip(window_sizes, vfc_op.windows):
+            if sparse_windows:
+                assert sparse.issparse(window)
+                window = window.toarray()
+            np.testing.assert_allclose(
+                window,
+                vfc_op._compute_window(G.diff_op.toarray(), t),
+                atol=1e-6,
+            )
+
+    def test_spectral_windows(self):
+        self._assert_windows(self.G, self.window_sizes)
+
+    def test_asymmetric_kernel_windows(self):
+        with assert_warns_message(RuntimeWarning, "K should be symmetric"):
+            G = gt.Graph(self.data, kernel_symm=None, knn=5)
+        self._assert_windows(G, np.array([1, 3, 5]))
+
+    def test_diadic_windows(self):
+        self._assert_windows(self.G, np.array([2, 4, 8, 16]))
+
+    def test_multiresolution_spectrogram(self):
+        vfc_op = meld.VertexFrequencyCluster(window_sizes=self.window_sizes)
+        spectrogram = vfc_op.fit_transform(
+            self.G, sample_indicator=self.sample_indicators["expt"]
+        )
+        expected = sum(
+            vfc_op._activate(
+                vfc_op._compute_spectrogram(vfc_op.sample_indicator, window)
+            )
+            for window in vfc_op.windows
+        )
+        np.testing.assert_allclose(spectrogram, expected, atol=1e-5)
+
     def test_cluster_no_likelihood(self):
         vfc_op = meld.VertexFrequencyCluster(window_sizes=self.window_sizes)
         vfc_op.fit_predict(
@@ -264,6 +350,102 @@ class TestCluster(unittest.TestCase):
         )
         vfc_op.predict(n_clusters=2)
 
+    def test_predict_reuses_pca(self):
+        vfc_op = meld.VertexFrequencyCluster(
+            window_sizes=self.window_sizes, random_state=42
+        )
+        vfc_op.fit_transform(
+            self.G,
+            sample_indicator=self.sample_indicators["expt"],
+            likelihood=self.likelihoods["expt"],
+        )
+        vfc_op.predict()
+        pca_data = vfc_op._pca_data
+        vfc_op.predict()
+        assert vfc_op._pca_data is pca_data
+        vfc_op.predict(n_clusters=2)
+        assert vfc_op._pca_data.shape == (self.G.N, 2)
+
+    def test_predict_minibatch(self):
+        vfc_op = meld.VertexFrequencyCluster(
+            window_sizes=self.window_sizes, use_minibatch=True
+        )
+        clusters = vfc_op.fit_predict(
+            self.G, sample_indicator=self.sample_indicators["expt"]
+        )
+        assert len(clusters) == len(self.sample_labels)
+
+    def test_partial_fourier_basis(self):
+        vfc_op = meld.VertexFrequencyCluster(
+            window_sizes=self.window_sizes, n_eigenvectors=50
+        )
+        spectrogram = vfc_op.fit_transform(
+            self.G, sample_indicator=self.sample_indicators["expt"]
+        )
+        assert spectrogram.shape == (self.G.N, 50)
+        clusters = vfc_op.predict()
+        assert len(clusters) == len(self.sample_labels)
+
+    def test_fourier_basis_laplacian(self):
+        G = gt.Graph(self.data, use_pygsp=True)
+        vfc_op = meld.VertexFrequencyCluster(window_sizes=self.window_sizes)
+        vfc_op.fit(G)
+        G.compute_laplacian("normalized")
+        vfc_op.fit(G)
+        np.testing.assert_allclose(np.abs(vfc_op.eigenvectors), np.abs(G.U), atol=1e-6)
+
+    def test_transform_does_not_modify_input(self):
+        vfc_op = meld.VertexFrequencyCluster(window_sizes=self.window_sizes)
+        sample_indicator = self.sample_indicators["expt"].values.astype(np.float32)
+        expected = sample_indicator.copy()
+        vfc_op.fit_transform(self.G, sample_indicator=sample_indicator)
+        np.testing.assert_array_equal(sample_indicator, expected)
+        np.testing.assert_allclose(vfc_op.sample_indicator.mean(), 0, atol=1e-6)
+
+    def test_device(self):
+        spectrogram = meld.VertexFrequencyCluster(
+            window_sizes=self.window_sizes
+        ).fit_transform(self.G, sample_indicator=self.sample_indicators["expt"])
+        # falls back to the CPU when PyTorch or CUDA are not available
+        vfc_op = meld.VertexFrequencyCluster(
+            window_sizes=self.window_sizes, device="cuda", suppress=True
+        )
+        np.testing.assert_allclose(
+            vfc_op.fit_transform(
+                self.G, sample_indicator=self.sample_indicators["expt"]
+            ),
+            spectrogram,
+            atol=1e-5,
+        )
+        # sparse windows are not supported on a device
+        vfc_op = meld.VertexFrequencyCluster(
+            window_sizes=self.window_sizes, device="cpu:0", sparse=True
+        )
+        assert_warns_message(
+            RuntimeWarning,
+            "device=cpu:0 is not supported with sparse=True.",
+            vfc_op.fit,
+            self.G,
+        )
+        assert vfc_op._device is None
+
+    @unittest.skipIf(importlib.util.find_spec("torch") is None, "requires torch")
+    def test_torch_device(self):
+        spectrogram = meld.VertexFrequencyCluster(
+            window_sizes=self.window_sizes
+        ).fit_transform(self.G, sample_indicator=self.sample_indicators["expt"])
+        # any device other than "cpu" is computed with PyTorch
+        vfc_op = meld.VertexFrequencyCluster(
+            window_sizes=self.window_sizes, device="cpu:0"
+        )
+        vfc_op.fit(self.G)
+        assert vfc_op._device is not None
+        np.testing.assert_allclose(
+            vfc_op.transform(sample_indicator=self.sample_indicators["expt"]),
+            spectrogram,
+            atol=1e-5,
+        )
+
     def test_2d(self):
         vfc_op = meld.VertexFrequencyCluster(window_sizes=self.window_sizes)
         clusters = vfc_op.fit_predict(
@@ -373,4 +555,25 @@ class TestCluster(unittest.TestCase):
 
     def test_power_sparse(self):
         vfc_op = meld.VertexFrequencyCluster()
-        vfc_op._power_matrix(self.G.diff_op, 2)
+        assert sparse.issparse(vfc_op._power_matrix(self.G.diff_op, 2))
+        # powers past the fill-in crossover are computed densely
+        power = vfc_op._power_matrix(self.G.diff_op, 24)
+        assert not sparse.issparse(power)
+        np.testing.assert_allclose(
+            power,
+            np.linalg.matrix_power(self.G.diff_op.toarray(), 24),
+            atol=1e-12,
+        )
+        power = vfc_op._power_matrix(self.G.diff_op, 0)
+        assert sparse.issparse(power)
+        np.testing.assert_array_equal(power.toarray(), np.eye(self.G.N))
+
+    def test_sparse_ladder_windows(self):
+        self._assert_windows(self.G, self.window_sizes, sparse_windows=True)
+
+    def test_zero_window_size(self):
+        window_sizes = np.array([0, 1, 2, 4])
+        self._assert_windows(self.G, window_sizes, sparse_windows=True)
+        with assert_warns_message(RuntimeWarning, "K should be symmetric"):
+            G = gt.Graph(self.data, kernel_symm=None, knn=5)
+        self._assert_windows(G, window_sizes)
@@ -2,6 +2,7 @@
 
 import numpy as np
 import graphtools as gt
+import sklearn.preprocessing
 import meld
 from utils import make_batches
 
@@ -29,3 +30,23 @@ def test_utils():
     # Two samples
     densities = np.ones([100, 2])
     meld.utils.normalize_densities(sample_densities=densities)
+
+
+def test_normalize_columns():
+    X = np.random.normal(size=(3, 20, 10))
+    X[:, :, 0] = 0
+    expected = np.stack([sklearn.preprocessing.normalize(x, axis=0) for x in X])
+    np.testing.assert_allclose(meld.utils._normalize_columns(X), expected)
+
+
+def test_graph_cache():
+    data, labels = make_batches(n_pts_per_cluster=50)
+    G = gt.Graph(data, sample_idx=labels)
+    G_pygsp = meld.utils._check_pygsp_graph(G)
+    assert meld.utils._check_pygsp_graph(G) is G_pygsp
+    lmax = meld.filter._estimate_lmax(G_pygsp)
+    G_pygsp.compute_fourier_basis()
+    assert meld.filter._estimate_lmax(G_pygsp) == lmax
+    # the estimate follows a change of Laplacian
+    G_pygsp.compute_laplacian("normalized")
+    assert meld.filter._estimate_lmax(G_pygsp) <= 2 + 1e-6